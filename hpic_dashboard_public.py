@@ -6,12 +6,17 @@ Reads from CSV files for Streamlit Community Cloud deployment
 Run: streamlit run hpic_dashboard_public.py
 """
 import streamlit as st
-import plotly.express as px
 import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import pandas as pd
+import numpy as np
 from datetime import datetime
+import glob
+import hashlib
+import logging
 import os
+import tempfile
+
+logger = logging.getLogger(__name__)
 
 # Page configuration
 st.set_page_config(
@@ -21,22 +26,105 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Columns the dashboard reads from each CSV; anything else is skipped at parse time
+MEMBERSHIP_COLUMNS = [
+    'month_start', 'active_members', 'classic_members',
+    'champion_members', 'hpic_members', 'pmp_members'
+]
+MEMBERSHIP_DTYPES = {
+    'active_members': 'int32',
+    'classic_members': 'int32',
+    'champion_members': 'int32',
+    'hpic_members': 'int32',
+    'pmp_members': 'int32'
+}
+REVENUE_COLUMNS = [
+    'category', 'transaction_count', 'unique_contributors', 'total_revenue',
+    'percentage_of_total', 'revenue_2025', 'avg_transaction_amount'
+]
+REVENUE_DTYPES = {
+    'category': 'category',
+    'transaction_count': 'int32',
+    'unique_contributors': 'int32'
+}
+
+# Upper bound on points per timeline trace sent to the browser
+MAX_TIMELINE_POINTS = 1000
+
+# Milestones marked on the timeline when they fall inside the selected range
+TIMELINE_MILESTONES = [
+    ('2020-03-01', 'COVID Impact')
+]
+
+# Locate a data file
+def find_data_file(filename):
+    # Try public_data directory first (local development),
+    # then fall back to same directory (Streamlit Cloud deployment)
+    for path in (os.path.join('public_data', filename), filename):
+        if os.path.exists(path):
+            return path
+    return None
+
+# Read a CSV through an on-disk Parquet copy. The copy's name hashes the CSV's absolute
+# path, mtime and size plus the read options, so any change to the file (even one that
+# restores an older mtime) or to the columns/dtypes requested produces a fresh copy.
+def read_csv_via_parquet(csv_path, **read_csv_kwargs):
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    csv_stat = os.stat(csv_path)
+    source_key = repr((
+        os.path.abspath(csv_path), csv_stat.st_mtime_ns, csv_stat.st_size,
+        sorted(read_csv_kwargs.items())
+    ))
+    digest = hashlib.sha1(source_key.encode()).hexdigest()[:12]
+    parquet_path = os.path.join(tempfile.gettempdir(), f"hpic_{name}_{digest}.parquet")
+    
+    if os.path.exists(parquet_path):
+        try:
+            df = pd.read_parquet(parquet_path)
+            # Only trust the copy if it holds every requested dtype
+            expected_dtypes = read_csv_kwargs.get('dtype', {})
+            if all(col in df and str(df[col].dtype) == dtype for col, dtype in expected_dtypes.items()):
+                return df
+        except Exception as e:
+            logger.warning("Ignoring unreadable Parquet copy %s: %s", parquet_path, e)
+    
+    df = pd.read_csv(csv_path, **read_csv_kwargs)
+    try:
+        # Drop copies left behind by earlier versions of this CSV before writing the new one
+        for old_copy in glob.glob(os.path.join(tempfile.gettempdir(), f"hpic_{name}_*.parquet")):
+            os.remove(old_copy)
+        df.to_parquet(parquet_path, index=False)
+    except Exception as e:
+        # No Parquet engine or read-only temp dir - the CSV still works
+        logger.warning("Could not write Parquet copy of %s: %s", csv_path, e)
+    return df
+
 # Load data from CSV
-@st.cache_data(ttl=3600)  # Cache for 1 hour
 def load_membership_data():
+    csv_path = find_data_file('membership_timeline.csv')
+    if csv_path is None:
+        st.error("❌ Membership data file not found")
+        st.stop()
+    return _load_membership_csv(csv_path, os.path.getmtime(csv_path))
+
+@st.cache_resource(ttl=3600)  # One shared, read-only copy; refreshed hourly or when the CSV changes
+def _load_membership_csv(csv_path, csv_mtime):
     try:
-        # Try to load from public_data directory first (local development)
-        if os.path.exists('public_data/membership_timeline.csv'):
-            timeline_df = pd.read_csv('public_data/membership_timeline.csv')
-        # Fallback to same directory (Streamlit Cloud deployment)
-        elif os.path.exists('membership_timeline.csv'):
-            timeline_df = pd.read_csv('membership_timeline.csv')
-        else:
-            st.error("❌ Membership data file not found")
-            st.stop()
+        # Dates and compact integer counts are parsed in the same pass as the read
+        timeline_df = read_csv_via_parquet(
+            csv_path,
+            usecols=MEMBERSHIP_COLUMNS,
+            parse_dates=['month_start'],
+            dtype=MEMBERSHIP_DTYPES
+        )
+        
+        # Guard against a copy that holds month_start as strings
+        if not pd.api.types.is_datetime64_any_dtype(timeline_df['month_start']):
+            timeline_df['month_start'] = pd.to_datetime(timeline_df['month_start'])
         
-        # Convert dates
-        timeline_df['month_start'] = pd.to_datetime(timeline_df['month_start'])
+        # Date filtering binary-searches month_start, so keep it sorted
+        if not timeline_df['month_start'].is_monotonic_increasing:
+            timeline_df = timeline_df.sort_values('month_start', ignore_index=True)
         
         return timeline_df
         
@@ -44,109 +132,52 @@ def load_membership_data():
         st.error(f"❌ Error loading data: {e}")
         st.stop()
 
-@st.cache_data(ttl=3600)  # Cache for 1 hour
 def load_revenue_data():
+    csv_path = find_data_file('revenue_analysis.csv')
+    if csv_path is None:
+        st.error("❌ Revenue data file not found")
+        st.stop()
+    return _load_revenue_csv(csv_path, os.path.getmtime(csv_path))
+
+@st.cache_resource(ttl=3600)  # One shared, read-only copy; refreshed hourly or when the CSV changes
+def _load_revenue_csv(csv_path, csv_mtime):
     try:
-        # Try to load from public_data directory first (local development)
-        if os.path.exists('public_data/revenue_analysis.csv'):
-            revenue_df = pd.read_csv('public_data/revenue_analysis.csv')
-        # Fallback to same directory (Streamlit Cloud deployment)
-        elif os.path.exists('revenue_analysis.csv'):
-            revenue_df = pd.read_csv('revenue_analysis.csv')
-        else:
-            st.error("❌ Revenue data file not found")
-            st.stop()
-        
-        return revenue_df
+        # Categorical category column makes the per-category masks and groupby compare integer codes
+        return read_csv_via_parquet(csv_path, usecols=REVENUE_COLUMNS, dtype=REVENUE_DTYPES)
         
     except Exception as e:
         st.error(f"❌ Error loading revenue data: {e}")
         st.stop()
 
-# Main dashboard
-def main():
-    # Header
-    st.title("🏠 HPIC Membership Dashboard")
-    st.markdown("*Highland Park Improvement Club - Membership Analytics*")
-    st.info("📊 This dashboard shows aggregated membership data only - no individual member information is displayed or stored.")
-    
-    # Load data
-    timeline_df = load_membership_data()
-    revenue_df = load_revenue_data()
-    
-    # Sidebar filters
-    st.sidebar.header("📅 Filters")
-    
-    # Date range selector
-    min_date = timeline_df['month_start'].min().date()
-    max_date = timeline_df['month_start'].max().date()
-    
-    start_date = st.sidebar.date_input(
-        "Start Date",
-        value=min_date,
-        min_value=min_date,
-        max_value=max_date
-    )
-    
-    end_date = st.sidebar.date_input(
-        "End Date", 
-        value=max_date,
-        min_value=min_date,
-        max_value=max_date
+# Thin a timeline to at most max_points rows before charting, always keeping the latest month
+def downsample_timeline(df, max_points=MAX_TIMELINE_POINTS):
+    if len(df) <= max_points:
+        return df
+    step = -(-len(df) // max_points)  # ceiling division
+    return df.iloc[::-step].iloc[::-1]
+
+# Cast an integer array to the smallest dtype that holds its values. Plotly ships int32
+# arrays as-is (i4), so this keeps trace payloads as compact as its own int64 narrowing
+def narrow_int_array(values):
+    return values.astype(np.result_type(np.min_scalar_type(values.min()), np.min_scalar_type(values.max())), copy=False)
+
+# Build the membership timeline figure, cached per filtered range. cache_resource hands back
+# the live Figure (cache_data would unpickle and re-validate it on every hit); sharing it is
+# safe because st.plotly_chart only serializes the figure and never mutates it
+@st.cache_resource(ttl=3600)
+def build_timeline_fig(filtered_df):
+    chart_df = downsample_timeline(filtered_df)
+    x = chart_df['month_start'].to_numpy()
+    y_total, y_classic, y_champion = (
+        narrow_int_array(chart_df[col].to_numpy()) for col in ('active_members', 'classic_members', 'champion_members')
     )
-    
-    # Filter data
-    mask = (timeline_df['month_start'].dt.date >= start_date) & (timeline_df['month_start'].dt.date <= end_date)
-    filtered_df = timeline_df[mask]
-    
-    if filtered_df.empty:
-        st.warning("No data available for selected date range")
-        return
-    
-    # Key Metrics Row
-    current_data = filtered_df.iloc[-1]
-    previous_data = filtered_df.iloc[-2] if len(filtered_df) > 1 else current_data
-    
-    col1, col2, col3 = st.columns([1, 1, 1])
-    
-    with col1:
-        total_change = current_data['active_members'] - previous_data['active_members']
-        st.metric(
-            "Total Members",
-            f"{current_data['active_members']:,}",
-            delta=f"{total_change:+d}" if total_change != 0 else None
-        )
-    
-    with col2:
-        classic_pct = (current_data['classic_members'] / current_data['active_members']) * 100
-        st.metric(
-            "Classic Members",
-            f"{current_data['classic_members']:,}",
-            delta=f"{classic_pct:.1f}% of total"
-        )
-    
-    with col3:
-        champion_pct = (current_data['champion_members'] / current_data['active_members']) * 100
-        st.metric(
-            "Champion Members", 
-            f"{current_data['champion_members']:,}",
-            delta=f"{champion_pct:.1f}% of total"
-        )
-    
-    # Main Charts
-    st.markdown("---")
-    
-    # Timeline Chart
-    st.subheader("📈 Membership Timeline")
-    
-    # Create interactive timeline
     fig = go.Figure()
     
     # Main timeline
     fig.add_trace(
-        go.Scatter(
-            x=filtered_df['month_start'],
-            y=filtered_df['active_members'],
+        go.Scattergl(
+            x=x,
+            y=y_total,
             mode='lines+markers',
             name='Total Members',
             line=dict(color='#2E86AB', width=3),
@@ -155,9 +186,9 @@ def main():
     )
     
     fig.add_trace(
-        go.Scatter(
-            x=filtered_df['month_start'],
-            y=filtered_df['classic_members'],
+        go.Scattergl(
+            x=x,
+            y=y_classic,
             mode='lines+markers',
             name='Classic',
             line=dict(color='#A23B72', width=2),
@@ -166,9 +197,9 @@ def main():
     )
     
     fig.add_trace(
-        go.Scatter(
-            x=filtered_df['month_start'],
-            y=filtered_df['champion_members'],
+        go.Scattergl(
+            x=x,
+            y=y_champion,
             mode='lines+markers',
             name='Champion',
             line=dict(color='#F18F01', width=2),
@@ -176,37 +207,148 @@ def main():
         )
     )
     
-    # Milestone markers temporarily removed due to Plotly timestamp issues
+    # Milestone markers; x is passed as epoch milliseconds because Plotly's
+    # vline annotation positioning fails on pd.Timestamp values
+    first_month, last_month = filtered_df['month_start'].iloc[0], filtered_df['month_start'].iloc[-1]
+    for milestone_date, label in TIMELINE_MILESTONES:
+        milestone = pd.Timestamp(milestone_date)
+        if first_month <= milestone <= last_month:
+            fig.add_vline(
+                x=milestone.timestamp() * 1000,
+                line_dash="dash",
+                line_color="gray",
+                annotation_text=label,
+                annotation_position="top left"
+            )
     
     fig.update_layout(
         height=400,
         showlegend=True,
-        hovermode='x unified',
+        hovermode='x',
+        spikedistance=0,
         title="Membership Growth Over Time"
     )
     
     fig.update_xaxes(title_text="Date")
     fig.update_yaxes(title_text="Members")
     
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
+
+# Build the non-grant revenue pie chart (uncached: one trace is cheaper to build than to hash revenue_df for a cache key)
+def build_revenue_pie_fig(revenue_df):
+    # Filter out grants for pie chart
+    non_grant_df = revenue_df[revenue_df['category'] != 'grant']
+    
+    # Revenue pie chart (excluding grants)
+    fig_pie = go.Figure(
+        go.Pie(
+            labels=non_grant_df['category'].to_numpy(),
+            values=non_grant_df['total_revenue'].to_numpy(),
+            textposition='inside',
+            textinfo='percent+label',
+            hovertemplate='category=%{label}<br>total_revenue=%{value}<extra></extra>'
+        )
+    )
+    fig_pie.update_layout(
+        height=400,
+        title="Revenue Distribution (Excluding Grants)",
+        legend=dict(
+            orientation="v",
+            yanchor="top",
+            y=0.95,
+            xanchor="left",
+            x=1.01
+        )
+    )
+    
+    return fig_pie
+
+# Revenue columns that are summed overall and per category
+REVENUE_SUM_COLUMNS = ['total_revenue', 'revenue_2025', 'transaction_count', 'unique_contributors']
+
+# Aggregate the revenue table once per data load: overall totals plus per-category sums
+@st.cache_data(ttl=3600)
+def summarize_revenue(revenue_df):
+    totals = {col: revenue_df[col].sum() for col in REVENUE_SUM_COLUMNS}
+    by_category = revenue_df.groupby('category', sort=False, observed=True)[REVENUE_SUM_COLUMNS].sum().to_dict('index')
+    no_revenue = dict.fromkeys(REVENUE_SUM_COLUMNS, 0)
+    
+    return {
+        'total': totals,
+        'category_count': len(revenue_df),
+        'grant': by_category.get('grant', no_revenue),
+        'membership': by_category.get('membership', no_revenue),
+        'building_booster': by_category.get('building_booster', no_revenue)
+    }
+
+# Membership metrics and timeline for the selected date range
+def render_membership(filtered_df):
+    # Key Metrics Row (total, classic, champion counts for the latest two months)
+    counts = filtered_df[['active_members', 'classic_members', 'champion_members']].to_numpy()
+    current_counts = counts[-1]
+    previous_counts = counts[-2] if len(counts) > 1 else current_counts
+    
+    # Classic/Champion share of the current total in one vectorized division
+    tier_pcts = current_counts[1:] / current_counts[0] * 100
+    
+    col1, col2, col3 = st.columns([1, 1, 1])
+    
+    with col1:
+        total_change = current_counts[0] - previous_counts[0]
+        st.metric(
+            "Total Members",
+            f"{current_counts[0]:,}",
+            delta=f"{total_change:+d}" if total_change != 0 else None
+        )
+    
+    with col2:
+        st.metric(
+            "Classic Members",
+            f"{current_counts[1]:,}",
+            delta=f"{tier_pcts[0]:.1f}% of total"
+        )
     
+    with col3:
+        st.metric(
+            "Champion Members", 
+            f"{current_counts[2]:,}",
+            delta=f"{tier_pcts[1]:.1f}% of total"
+        )
+    
+    # Main Charts
+    st.markdown("---")
+    
+    # Timeline Chart
+    st.subheader("📈 Membership Timeline")
+    
+    # Create interactive timeline
+    fig = build_timeline_fig(filtered_df)
+    
+    st.plotly_chart(fig, use_container_width=True)
+
+# Revenue metrics, distribution chart, table and insights
+def render_revenue(revenue_df):
     # Revenue Analysis Section
     st.markdown("---")
     st.subheader("💰 Revenue Analysis")
     
+    summary = summarize_revenue(revenue_df)
+    totals = summary['total']
+    grant = summary['grant']
+    
     # Revenue Overview Metrics
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        total_revenue = revenue_df['total_revenue'].sum()
+        total_revenue = totals['total_revenue']
         st.metric(
             "Total Revenue",
             f"${total_revenue:,.0f}",
-            delta=f"${revenue_df['revenue_2025'].sum():,.0f} in 2025"
+            delta=f"${totals['revenue_2025']:,.0f} in 2025"
         )
     
     with col2:
-        grant_revenue = revenue_df[revenue_df['category'] == 'grant']['total_revenue'].sum()
+        grant_revenue = grant['total_revenue']
         grant_pct = (grant_revenue / total_revenue) * 100
         st.metric(
             "Grant Revenue",
@@ -215,8 +357,8 @@ def main():
         )
     
     with col3:
-        total_transactions = revenue_df['transaction_count'].sum()
-        unique_contributors = revenue_df['unique_contributors'].sum()
+        total_transactions = totals['transaction_count']
+        unique_contributors = totals['unique_contributors']
         st.metric(
             "Total Transactions",
             f"{total_transactions:,}",
@@ -224,7 +366,7 @@ def main():
         )
     
     with col4:
-        avg_transaction = revenue_df['total_revenue'].sum() / revenue_df['transaction_count'].sum()
+        avg_transaction = totals['total_revenue'] / totals['transaction_count']
         st.metric(
             "Avg Transaction",
             f"${avg_transaction:.2f}",
@@ -237,33 +379,7 @@ def main():
     # Revenue Distribution Chart
     st.subheader("📊 Non-Grant Revenue Distribution")
     
-    # Filter out grants for pie chart
-    non_grant_df = revenue_df[revenue_df['category'] != 'grant']
-    
-    # Revenue pie chart (excluding grants)
-    fig_pie = px.pie(
-        non_grant_df, 
-        values='total_revenue', 
-        names='category',
-        title="Revenue Distribution (Excluding Grants)",
-        color_discrete_map={
-            'membership': '#4ECDC4', 
-            'donation': '#45B7D1',
-            'other': '#96CEB4',
-            'building_booster': '#FFEAA7'
-        }
-    )
-    fig_pie.update_traces(textposition='inside', textinfo='percent+label')
-    fig_pie.update_layout(
-        height=400,
-        legend=dict(
-            orientation="v",
-            yanchor="top",
-            y=0.95,
-            xanchor="left",
-            x=1.01
-        )
-    )
+    fig_pie = build_revenue_pie_fig(revenue_df)
     st.plotly_chart(fig_pie, use_container_width=True)
     
     
@@ -293,32 +409,78 @@ def main():
         st.info("WA Dept of Commerce grant automatically categorized as 'grant' revenue")
         
         st.markdown("**💵 Membership Calculation:**")
-        membership_revenue = revenue_df[revenue_df['category'] == 'membership']['total_revenue'].sum()
-        membership_transactions = revenue_df[revenue_df['category'] == 'membership']['transaction_count'].sum()
+        membership_revenue = summary['membership']['total_revenue']
+        membership_transactions = summary['membership']['transaction_count']
         st.info(f"${membership_revenue:,.0f} from {membership_transactions:,} membership transactions")
         
         st.markdown("**🏗️ Building Booster Tracking:**")
-        booster_revenue = revenue_df[revenue_df['category'] == 'building_booster']['total_revenue'].sum()
-        booster_contributors = revenue_df[revenue_df['category'] == 'building_booster']['unique_contributors'].sum()
+        booster_revenue = summary['building_booster']['total_revenue']
+        booster_contributors = summary['building_booster']['unique_contributors']
         st.info(f"${booster_revenue:,.0f} from {booster_contributors:,} recurring facility donors")
     
     with col2:
         st.markdown("**📊 Comprehensive Stats:**")
         total_stats = f"""
-        - Total transactions: {revenue_df['transaction_count'].sum():,}
-        - Unique contributors: {revenue_df['unique_contributors'].sum():,}
-        - Categories tracked: {len(revenue_df):,}
+        - Total transactions: {totals['transaction_count']:,}
+        - Unique contributors: {totals['unique_contributors']:,}
+        - Categories tracked: {summary['category_count']:,}
         - Grant percentage: {(grant_revenue/total_revenue)*100:.1f}%
         """
         st.info(total_stats)
         
         st.markdown("**🗓️ 2025 Revenue Summary:**")
         revenue_2025_summary = f"""
-        - Total 2025: ${revenue_df['revenue_2025'].sum():,.0f}
-        - Grant portion: ${revenue_df[revenue_df['category'] == 'grant']['revenue_2025'].sum():,.0f}
-        - Non-grant portion: ${revenue_df[revenue_df['category'] != 'grant']['revenue_2025'].sum():,.0f}
+        - Total 2025: ${totals['revenue_2025']:,.0f}
+        - Grant portion: ${grant['revenue_2025']:,.0f}
+        - Non-grant portion: ${totals['revenue_2025'] - grant['revenue_2025']:,.0f}
         """
         st.info(revenue_2025_summary)
+
+# Main dashboard
+def main():
+    # Header
+    st.title("🏠 HPIC Membership Dashboard")
+    st.markdown("*Highland Park Improvement Club - Membership Analytics*")
+    st.info("📊 This dashboard shows aggregated membership data only - no individual member information is displayed or stored.")
+    
+    # Load data
+    timeline_df = load_membership_data()
+    revenue_df = load_revenue_data()
+    
+    # Sidebar filters
+    st.sidebar.header("📅 Filters")
+    
+    # Date range selector
+    min_date = timeline_df['month_start'].min().date()
+    max_date = timeline_df['month_start'].max().date()
+    
+    start_date = st.sidebar.date_input(
+        "Start Date",
+        value=min_date,
+        min_value=min_date,
+        max_value=max_date
+    )
+    
+    end_date = st.sidebar.date_input(
+        "End Date", 
+        value=max_date,
+        min_value=min_date,
+        max_value=max_date
+    )
+    
+    # Filter data (month_start is sorted, so slice between the two bounds)
+    lo, hi = timeline_df['month_start'].searchsorted(
+        [pd.Timestamp(start_date), pd.Timestamp(end_date) + pd.Timedelta(days=1)]
+    )
+    filtered_df = timeline_df.iloc[lo:hi]
+    
+    if filtered_df.empty:
+        st.warning("No data available for selected date range")
+        return
+    
+    render_membership(filtered_df)
+    
+    render_revenue(revenue_df)
     
     
     # About section